@@ -0,0 +1,27 @@
+"""Finding and decoding the WAV files the analysis modules work on."""
+
+import os
+from typing import List, Tuple
+
+import numpy as np
+import soundfile as sf
+
+
+def list_wavs(folder_path: str) -> List[str]:
+    """Return the sorted paths of the ``.wav`` files directly in *folder_path*.
+
+    One directory scan; entries carry their type, so no stat per file.
+    """
+    return sorted(entry.path for entry in os.scandir(folder_path)
+                  if entry.is_file() and entry.name.lower().endswith('.wav'))
+
+
+def load_mono(wav_path: str) -> Tuple[np.ndarray, int]:
+    """Decode *wav_path* at its native sample rate, downmixed to mono.
+
+    Returns:
+        Tuple ``(y, sr)`` of the float32 signal and its sample rate.
+    """
+    data, sr = sf.read(wav_path, dtype='float32', always_2d=False)
+    y = data if data.ndim == 1 else data.mean(axis=1)
+    return y, sr
@@ -1,9 +1,19 @@
 """BPM estimation from WAV audio files."""
 
+import functools
 import os
+from typing import Tuple
 import numpy as np
 import librosa
 
+from audio_io import load_mono
+from cache import cached_by_file
+from energy import HOP_LENGTH
+
+# STFT frame size for onset envelopes (librosa's default). Frames are
+# energy.HOP_LENGTH samples apart.
+N_FFT = 2048
+
 
 def get_bpm(filepath: str) -> float:
     """Estimate the global BPM of a WAV audio file.
@@ -36,25 +46,102 @@ def get_bpm(filepath: str) -> float:
     try:
         # Load as mono at the file's native sample rate so beat tracking
         # operates on the full stereo mix without resampling artifacts.
-        y, sr = librosa.load(filepath, mono=True, sr=None)
+        y, sr = load_mono(filepath)
     except Exception as exc:
         raise ValueError(
             f"Failed to decode audio file {filepath!r}: {exc}"
         ) from exc
 
+    return get_bpm_from_array(y, sr)
+
+
+def get_bpm_from_array(y: np.ndarray, sr: int) -> float:
+    """Estimate the global BPM of an already-decoded mono audio array.
+
+    Same algorithm as ``get_bpm``, for callers that have loaded the audio
+    themselves and want to avoid decoding the file again.
+
+    Args:
+        y: Mono audio time-series.
+        sr: Sample rate of *y* in Hz.
+
+    Returns:
+        Estimated BPM as a float rounded to 2 decimal places,
+        guaranteed to be in the range [60.0, 200.0].
+
+    Raises:
+        ValueError: If *y* contains no samples, or if the estimated BPM
+            falls outside the valid range [60, 200].
+    """
     if y.size == 0:
-        raise ValueError(f"Audio file contains no samples: {filepath!r}")
+        raise ValueError("Audio contains no samples")
+
+    return get_bpm_from_onset_envelope(onset_envelope(y, sr), sr)
+
+
+@functools.lru_cache(maxsize=8)
+def _mel_basis(sr: int) -> np.ndarray:
+    """Mel filterbank for *sr*, built once per sample rate and reused."""
+    basis = librosa.filters.mel(sr=sr, n_fft=N_FFT)
+    basis.flags.writeable = False
+    return basis
+
+
+def onset_envelope(y: np.ndarray, sr: int, center: bool = True) -> np.ndarray:
+    """Compute the onset-strength envelope used for every BPM estimate.
+
+    Equivalent to ``librosa.onset.onset_strength(y=y, sr=sr,
+    aggregate=np.median)``, but the mel filterbank is cached per sample
+    rate instead of being rebuilt on every call.
+
+    Median aggregation suppresses spurious peaks from noise, giving a
+    cleaner signal to the beat tracker. Frames are ``HOP_LENGTH`` samples
+    apart, so callers can compute this once per track and slice it with
+    ``librosa.time_to_frames(..., hop_length=HOP_LENGTH)``.
+
+    Args:
+        y: Mono audio time-series.
+        sr: Sample rate of *y* in Hz.
+        center: Centre STFT frames on multiples of ``HOP_LENGTH`` (the
+            librosa default). ``False`` frames from the first sample with
+            no padding, which lets envelopes of overlapping blocks be
+            joined end to end.
+
+    Returns:
+        1-D onset-strength envelope.
+    """
+    power = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH, center=center)) ** 2
+    mel = _mel_basis(sr) @ power
+    return librosa.onset.onset_strength(
+        S=librosa.power_to_db(mel), sr=sr, aggregate=np.median, center=center
+    )
+
 
-    # Onset strength envelope with median aggregation suppresses spurious
-    # peaks from noise, giving a cleaner signal to the beat tracker.
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr, aggregate=np.median)
+def get_bpm_from_onset_envelope(
+    onset_env: np.ndarray, sr: int, start_bpm: float = 120.0
+) -> float:
+    """Estimate BPM from a precomputed onset-strength envelope.
+
+    Args:
+        onset_env: Envelope from ``onset_envelope`` (or a slice of one).
+        sr: Sample rate of the audio the envelope was computed from.
+        start_bpm: Weak BPM prior passed to the beat tracker.
+
+    Returns:
+        Estimated BPM as a float rounded to 2 decimal places,
+        guaranteed to be in the range [60.0, 200.0].
 
-    # Dynamic-programming beat tracker. start_bpm=120 is a weak prior;
+    Raises:
+        ValueError: If the estimated BPM falls outside the valid
+            range [60, 200].
+    """
+    # Dynamic-programming beat tracker. start_bpm is a weak prior;
     # the tracker will deviate substantially when the evidence is clear.
     tempo, _ = librosa.beat.beat_track(
         onset_envelope=onset_env,
         sr=sr,
-        start_bpm=120.0,
+        hop_length=HOP_LENGTH,
+        start_bpm=start_bpm,
         units="frames",
     )
 
@@ -67,4 +154,45 @@ def get_bpm(filepath: str) -> float:
             "The track may be silent, extremely slow, or extremely fast."
         )
 
-    return bpm
\ No newline at end of file
+    return bpm
+
+
+@cached_by_file("beat_grid-v1")
+def beat_grid(filepath: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Track the beats and downbeats of a WAV audio file.
+
+    Beat tracking takes seconds per track, so results are cached per file
+    (on disk and in memory, see ``cache.cached_by_file``) and computed at
+    most once per version of the file.
+
+    Downbeats assume 4/4: every 4th beat, starting from whichever of the
+    first four beats gives the strongest average onset. The returned
+    arrays are shared between cached calls, so they are read-only.
+
+    Args:
+        filepath: Path to a ``.wav`` audio file.
+
+    Returns:
+        ``(beats, downbeats)``: beat and downbeat times in seconds.
+
+    Raises:
+        ValueError: If the file contains no samples.
+    """
+    y, sr = load_mono(filepath)
+    if y.size == 0:
+        raise ValueError(f"Audio file contains no samples: {filepath!r}")
+
+    onset_env = onset_envelope(y, sr)
+    _, beats = librosa.beat.beat_track(
+        onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH, units="frames"
+    )
+
+    strength = onset_env[beats]
+    phase = int(np.argmax([strength[p::4].mean() for p in range(min(4, beats.size))] or [0]))
+    downbeats = beats[phase::4]
+
+    beat_times = librosa.frames_to_time(beats, sr=sr, hop_length=HOP_LENGTH)
+    downbeat_times = librosa.frames_to_time(downbeats, sr=sr, hop_length=HOP_LENGTH)
+    beat_times.flags.writeable = False
+    downbeat_times.flags.writeable = False
+    return beat_times, downbeat_times
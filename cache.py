@@ -0,0 +1,139 @@
+"""Persistent on-disk cache for per-file audio analysis results.
+
+Results live in a small SQLite database keyed on a file's absolute path and
+a namespace. Each entry also records the file's modification time and size
+when it was stored; if either has changed since, the entry is treated as a
+miss, so edited or replaced files are re-analysed automatically.
+
+The cache is best-effort: if the database cannot be opened or written, a
+warning is issued and callers simply recompute.
+
+``cached_by_file`` wraps an analysis function so that both this database and
+an in-process LRU sit in front of it.
+"""
+
+import functools
+import os
+import pickle
+import sqlite3
+import warnings
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+# Override with the AI_DJ_CACHE_DIR environment variable.
+CACHE_DIR = Path(os.environ.get("AI_DJ_CACHE_DIR", "~/.cache/ai-dj")).expanduser()
+
+_DB_PATH = CACHE_DIR / "analysis.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path      TEXT    NOT NULL,
+    namespace TEXT    NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    payload   BLOB    NOT NULL,
+    PRIMARY KEY (path, namespace)
+)
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Worker processes share the database; wait on locks rather than fail.
+    conn = sqlite3.connect(_DB_PATH, timeout=30)
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def load_cached(filepath: str, namespace: str) -> Optional[Any]:
+    """Return the value stored for *filepath* under *namespace*.
+
+    Args:
+        filepath: Path to the analysed file.
+        namespace: Name identifying which analysis the value came from.
+            Include a version in it to invalidate old entries when the
+            analysis changes.
+
+    Returns:
+        The cached value, or ``None`` if there is no entry or the file has
+        been modified since it was stored.
+    """
+    path = os.path.abspath(filepath)
+    try:
+        stat = os.stat(path)
+        with closing(_connect()) as conn:
+            row = conn.execute(
+                "SELECT mtime_ns, size, payload FROM results"
+                " WHERE path = ? AND namespace = ?",
+                (path, namespace),
+            ).fetchone()
+    except (OSError, sqlite3.Error) as exc:
+        warnings.warn(f"Analysis cache unavailable: {exc}", stacklevel=2)
+        return None
+
+    if row is None or (row[0], row[1]) != (stat.st_mtime_ns, stat.st_size):
+        return None
+    return pickle.loads(row[2])
+
+
+def store_cached(filepath: str, namespace: str, value: Any) -> None:
+    """Store *value* for *filepath* under *namespace*, replacing any old entry.
+
+    Args:
+        filepath: Path to the analysed file.
+        namespace: Name identifying which analysis produced *value*.
+        value: Any picklable object.
+    """
+    path = os.path.abspath(filepath)
+    try:
+        stat = os.stat(path)
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (path, namespace, stat.st_mtime_ns, stat.st_size, payload),
+            )
+    except (OSError, sqlite3.Error) as exc:
+        warnings.warn(f"Could not write analysis cache: {exc}", stacklevel=2)
+
+
+def cached_by_file(namespace: str, maxsize: int = 128) -> Callable:
+    """Decorate a function of a single file path with on-disk and in-memory caching.
+
+    The wrapped function's result must depend only on the contents of the
+    file. Results are looked up in memory first (keyed on the path, its
+    modification time and size, so edits still invalidate), then in the
+    on-disk cache under *namespace*, and only computed on a miss.
+
+    The wrapper also takes ``use_cache``; passing ``False`` skips both
+    lookups, recomputes, and stores the fresh result.
+
+    Args:
+        namespace: Cache namespace; include a version in it and bump it when
+            the wrapped analysis changes.
+        maxsize: Number of results kept in the in-process LRU.
+    """
+    def decorator(func: Callable[[str], Any]) -> Callable[[str], Any]:
+        @functools.lru_cache(maxsize=maxsize)
+        def memo(path: str, mtime_ns: int, size: int) -> Any:
+            value = load_cached(path, namespace)
+            if value is None:
+                value = func(path)
+                store_cached(path, namespace, value)
+            return value
+
+        @functools.wraps(func)
+        def wrapper(filepath: str, use_cache: bool = True) -> Any:
+            path = os.path.abspath(filepath)
+            if not use_cache:
+                value = func(path)
+                store_cached(path, namespace, value)
+                return value
+            stat = os.stat(path)
+            return memo(path, stat.st_mtime_ns, stat.st_size)
+
+        wrapper.cache_clear = memo.cache_clear
+        return wrapper
+
+    return decorator
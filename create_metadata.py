@@ -4,31 +4,34 @@ Each WAV file is analysed for:
   - Musical key         (get_key)
   - Structural sections (get_sections)
   - Global BPM          (get_bpm)
-  - Per-section BPM     (computed from audio slices between section timestamps)
+  - Per-section BPM     (computed from onset-envelope slices between section timestamps)
 
 The result is a tidy, long-format DataFrame with one row per (track, section).
 
-Note: get_key and get_sections are expected to accept a filepath argument
-once their implementations are complete.
+Each file is streamed from disk once; only its onset envelope and a
+low-rate mono copy are kept in memory for the analyses.
 """
 
+import importlib
+import multiprocessing
 import os
-import sys
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import List
+from typing import Dict, Optional, Tuple
 
 import librosa
 import numpy as np
 import pandas as pd
+import soundfile as sf
+import soxr
 
-from bpm import get_bpm
-from sections import get_sections
-
-# get_key lives in the get_key/ sub-folder; add it to the path so its
-# internal imports (key_profiles, camelot) resolve correctly too.
-sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "get_key"))
-from get_key import get_key  # noqa: E402
+from cache import CACHE_DIR, load_cached, store_cached
+from bpm import N_FFT, get_bpm_from_onset_envelope, onset_envelope
+from energy import HOP_LENGTH
+from get_key import KEY_SR, get_key_from_array
+from sections import analysis_device, analyze_tracks, get_sections
 
 
 # ---------------------------------------------------------------------------
@@ -47,17 +50,51 @@ _COLUMNS = [
     "section_bpm",
 ]
 
+_FLOAT_COLUMNS = {"global_bpm", "section_start", "section_end", "section_bpm"}
+
+# Length of each block read from disk by ``_stream_track``.
+_BLOCK_SECONDS = 30
+
+# Heavy libraries every worker needs. Imported once in the forkserver so
+# forked workers inherit them, and again by ``_preload`` for start methods
+# that do not fork.
+_PRELOAD_MODULES = ["numpy", "soundfile", "librosa", "numba", "allin1"]
+
+# Cache namespace for per-track results. Bump the version whenever the
+# analysis changes so stale entries are recomputed.
+_CACHE_NAMESPACE = "create_metadata-v1"
 
-def _bpm_from_array(y: np.ndarray, sr: int, start_bpm: float = 120.0) -> float:
-    """Estimate BPM directly from a mono audio array.
+
+def _track_columns(
+    filename, filepath, key_code, key_name, global_bpm,
+    sections, section_starts, section_ends, section_bpms,
+) -> Dict[str, list]:
+    """Lay out one track's results column-wise, repeating per-track fields
+    once per section."""
+    n = len(sections)
+    return {
+        "filename": [filename] * n,
+        "filepath": [filepath] * n,
+        "key_code": [key_code] * n,
+        "key_name": [key_name] * n,
+        "global_bpm": [global_bpm] * n,
+        "section": sections,
+        "section_start": section_starts,
+        "section_end": section_ends,
+        "section_bpm": section_bpms,
+    }
+
+
+def _section_bpm(onset_env: np.ndarray, sr: int, start_bpm: float = 120.0) -> float:
+    """Estimate BPM for one section from its slice of the track's onset envelope.
 
     Uses the same onset-strength + dynamic-programming algorithm as
-    ``get_bpm`` but operates on an in-memory slice so section segments
-    never need to be written to disk.
+    ``get_bpm``, but the envelope is computed once per track and sliced
+    per section, so each section costs only the beat tracking.
 
     Args:
-        y: Mono audio time-series (numpy float32/64 array).
-        sr: Sample rate in Hz.
+        onset_env: Slice of the track's onset envelope (see ``_stream_track``).
+        sr: Sample rate of the audio in Hz.
         start_bpm: Weak BPM prior passed to the beat tracker.
 
     Returns:
@@ -65,18 +102,227 @@ def _bpm_from_array(y: np.ndarray, sr: int, start_bpm: float = 120.0) -> float:
         too short or the estimate falls outside [60, 200].
     """
     # Need at least ~4 seconds for a reliable estimate.
-    if y.size < sr * 4:
+    if onset_env.size * HOP_LENGTH < sr * 4:
+        return float("nan")
+
+    try:
+        return get_bpm_from_onset_envelope(onset_env, sr, start_bpm=start_bpm)
+    except ValueError:
         return float("nan")
 
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr, aggregate=np.median)
-    tempo, _ = librosa.beat.beat_track(
-        onset_envelope=onset_env,
-        sr=sr,
-        start_bpm=start_bpm,
-        units="frames",
+
+def _preload() -> None:
+    """Pool initializer: get a worker fully warm before its first task.
+
+    Imports the analysis libraries (already in memory under
+    ``forkserver``), then runs librosa's numba-compiled paths once on a
+    couple of seconds of noise so the JIT cost is not charged to the
+    first file. With ``NUMBA_CACHE_DIR`` shared between workers, only the
+    first worker ever compiles; the rest load the cached machine code.
+    """
+    for name in _PRELOAD_MODULES:
+        importlib.import_module(name)
+
+    # Noise rather than silence: beat_track returns early on an empty
+    # onset envelope and would skip the code being warmed.
+    y = np.random.default_rng(0).standard_normal(2 * KEY_SR).astype(np.float32)
+    librosa.beat.beat_track(onset_envelope=onset_envelope(y, KEY_SR), sr=KEY_SR)
+    librosa.feature.chroma_stft(y=y, sr=KEY_SR, n_fft=4096, hop_length=2048)
+
+
+def _pool_context():
+    """Multiprocessing context for the analysis pool.
+
+    ``forkserver`` forks each worker from a server process that has already
+    imported ``_PRELOAD_MODULES``, so workers start warm without forking
+    the parent (which may hold torch/CUDA state). Falls back to the platform
+    default where it is unavailable.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return None
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(_PRELOAD_MODULES)
+    return ctx
+
+
+def _stream_track(filepath_str: str) -> Tuple[np.ndarray, np.ndarray, int, float]:
+    """Decode a WAV block by block, keeping only what the analyses need.
+
+    Long DJ mixes are too big to hold at full rate, and nothing here needs
+    them to be: BPM works from the onset envelope (one value per
+    ``HOP_LENGTH`` samples), while key and section analysis only need a
+    mono copy at ``KEY_SR``.
+
+    Blocks overlap by ``N_FFT`` samples and each one is framed without
+    centring, so the per-block envelopes join into exactly the frames a
+    single ``onset_envelope`` pass over the whole track would give.
+
+    Args:
+        filepath_str: Path to a ``.wav`` audio file.
+
+    Returns:
+        ``(onset_env, y_low, sr, duration)``: the onset envelope at the
+        native sample rate *sr*, the mono signal resampled to ``KEY_SR``,
+        and the track duration in seconds.
+
+    Raises:
+        ValueError: If the file contains no samples.
+    """
+    info = sf.info(filepath_str)
+    sr = info.samplerate
+    if info.frames == 0:
+        raise ValueError(f"Audio file contains no samples: {filepath_str!r}")
+
+    # A whole number of hops past the first frame, so every block's frames
+    # land on the global frame grid.
+    blocksize = N_FFT + (_BLOCK_SECONDS * sr // HOP_LENGTH) * HOP_LENGTH
+    resampler = soxr.ResampleStream(sr, KEY_SR, 1, dtype="float32")
+
+    # A centred single-pass envelope leads an uncentred one by N_FFT //
+    # HOP_LENGTH frames (half a frame of centring + librosa's own shift).
+    envelopes = [np.zeros(N_FFT // HOP_LENGTH, dtype=np.float32)]
+    low_rate = []
+
+    blocks = sf.blocks(filepath_str, blocksize=blocksize, overlap=N_FFT, dtype="float32")
+    for i, block in enumerate(blocks):
+        mono = block if block.ndim == 1 else block.mean(axis=1)
+
+        # Only the samples past the overlap are new to the resampler.
+        low_rate.append(resampler.resample_chunk(mono if i == 0 else mono[N_FFT:]))
+
+        if mono.size >= N_FFT:
+            env = onset_envelope(mono, sr, center=False)
+            # Frame 0 of every later block repeats the previous block's last.
+            envelopes.append(env if i == 0 else env[1:])
+
+    low_rate.append(resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+
+    return np.concatenate(envelopes), np.concatenate(low_rate), sr, info.frames / sr
+
+
+def _process_one(
+    filepath_str: str, use_cache: bool = True, reuse_sections: Optional[bool] = None
+) -> Dict[str, list]:
+    """Analyse a single WAV file and return its metadata rows.
+
+    Defined at module level so it can be pickled and dispatched to the
+    worker processes of ``create_metadata``.
+
+    Results are stored in the on-disk analysis cache (see ``cache``) when
+    every analysis succeeded, and served from it on later runs as long
+    as the file is unchanged.
+
+    Args:
+        filepath_str: Absolute path to a ``.wav`` audio file.
+        use_cache: Whether to read the analysis cache. Successful results
+            are stored either way.
+        reuse_sections: Whether to reuse cached section analysis. Defaults
+            to *use_cache*; ``create_metadata`` sets it after refreshing
+            every file's sections itself in one batch.
+
+    Returns:
+        Column name -> list of values (see ``_track_columns``), with one
+        entry per detected section, or a single entry with empty section
+        fields if no sections were found.
+    """
+    filename = os.path.basename(filepath_str)
+    if reuse_sections is None:
+        reuse_sections = use_cache
+
+    if use_cache:
+        cached = load_cached(filepath_str, _CACHE_NAMESPACE)
+        if cached is not None:
+            print(f"  Cached: {filename}")
+            return cached
+
+    print(f"  Processing: {filename}")
+
+    # Only fully successful analyses are cached, so a transient failure
+    # is retried on the next run.
+    failed = False
+
+    # ------------------------------------------------------------------ #
+    # Stream the audio once; every analysis below reuses what it keeps    #
+    # ------------------------------------------------------------------ #
+    try:
+        onset_env, y_low, sr, track_duration = _stream_track(filepath_str)
+    except Exception as exc:
+        warnings.warn(f"[{filename}] failed to load audio: {exc}", stacklevel=2)
+        return _track_columns(
+            filename, filepath_str, None, None, float("nan"),
+            [None], [float("nan")], [float("nan")], [float("nan")],
+        )
+
+    # ------------------------------------------------------------------ #
+    # Global BPM                                                           #
+    # ------------------------------------------------------------------ #
+    # The onset envelope is shared with the per-section estimates below.
+    try:
+        global_bpm = get_bpm_from_onset_envelope(onset_env, sr)
+    except Exception as exc:
+        warnings.warn(f"[{filename}] get_bpm failed: {exc}", stacklevel=2)
+        global_bpm = float("nan")
+        failed = True
+
+    # ------------------------------------------------------------------ #
+    # Musical key  —  get_key_from_array(y, sr) -> (int, str)             #
+    # ------------------------------------------------------------------ #
+    try:
+        key_code, key_name = get_key_from_array(y_low, KEY_SR)
+    except Exception as exc:
+        warnings.warn(f"[{filename}] get_key failed: {exc}", stacklevel=2)
+        key_code, key_name = None, None
+        failed = True
+
+    # ------------------------------------------------------------------ #
+    # Structural sections  —  get_sections(filepath, y, sr)               #
+    #   -> sequence of (section_label: str, timestamp: float) tuples      #
+    # ------------------------------------------------------------------ #
+    try:
+        sections = get_sections(filepath_str, y_low, KEY_SR, use_cache=reuse_sections)
+    except Exception as exc:
+        warnings.warn(f"[{filename}] get_sections failed: {exc}", stacklevel=2)
+        sections = ()
+        failed = True
+
+    # ------------------------------------------------------------------ #
+    # Emit one row per section                                            #
+    # ------------------------------------------------------------------ #
+    if not sections:
+        columns = _track_columns(
+            filename, filepath_str, key_code, key_name, global_bpm,
+            [None], [float("nan")], [float("nan")], [float("nan")],
+        )
+        if not failed:
+            store_cached(filepath_str, _CACHE_NAMESPACE, columns)
+        return columns
+
+    # Section bounds as arrays: a missing (None) start becomes NaN, and each
+    # section ends where the next starts, or at the end of the track.
+    labels = [label for label, _ in sections]
+    starts = np.array([start for _, start in sections], dtype=np.float64)
+    ends = np.append(starts[1:], track_duration)
+    valid = ~(np.isnan(starts) | np.isnan(ends))
+
+    # Same flooring as librosa.time_to_frames, for all sections at once.
+    start_frames = (np.where(valid, starts, 0.0) * sr).astype(np.int64) // HOP_LENGTH
+    end_frames = (np.where(valid, ends, 0.0) * sr).astype(np.int64) // HOP_LENGTH
+
+    # Per-section BPM from each section's slice of the onset envelope.
+    prior = global_bpm if not np.isnan(global_bpm) else 120.0
+    bpms = [
+        _section_bpm(onset_env[start_frames[i]:end_frames[i]], sr, start_bpm=prior)
+        if valid[i] else float("nan")
+        for i in range(len(labels))
+    ]
+
+    columns = _track_columns(
+        filename, filepath_str, key_code, key_name, global_bpm,
+        labels, starts.tolist(), ends.tolist(), bpms,
     )
-    bpm = round(float(np.atleast_1d(tempo)[0]), 2)
-    return bpm if 60.0 <= bpm <= 200.0 else float("nan")
+    if not failed:
+        store_cached(filepath_str, _CACHE_NAMESPACE, columns)
+    return columns
 
 
 # ---------------------------------------------------------------------------
@@ -86,18 +332,27 @@ def _bpm_from_array(y: np.ndarray, sr: int, start_bpm: float = 120.0) -> float:
 def create_metadata(
     folder_path: str,
     output_dir: str = "/Users/alishasrivastava/Desktop/ai-dj/data/results",
+    max_workers: Optional[int] = None,
+    output_format: str = "parquet",
+    use_cache: bool = True,
 ) -> pd.DataFrame:
     """Build a metadata DataFrame for all WAV files in *folder_path*.
 
     For every ``.wav`` file the function:
 
-    1. Calls ``get_bpm(filepath)`` for the global tempo.
-    2. Calls ``get_key(filepath)`` → ``(key_code: int, key_name: str)``.
-    3. Calls ``get_sections(filepath)`` → sequence of
+    1. Streams the audio once, computing its onset envelope and a
+       low-rate mono copy, and calls ``get_bpm_from_onset_envelope`` for
+       the global tempo.
+    2. Calls ``get_key_from_array(y, sr)`` on the low-rate copy →
+       ``(key_code: int, key_name: str)``.
+    3. Calls ``get_sections(filepath, y, sr)`` → sequence of
        ``(section_label: str, timestamp: float)`` tuples, where timestamps
        are in seconds from the start of the track.
-    4. Slices the audio between consecutive section timestamps and estimates
-       a per-section BPM for each slice.
+    4. Slices the onset envelope between consecutive section timestamps
+       and estimates a per-section BPM for each slice.
+
+    Files are analysed in parallel across a process pool; rows are
+    emitted in sorted filename order regardless of completion order.
 
     The returned DataFrame is in **long format**: one row per
     ``(track, section)`` pair.
@@ -105,9 +360,17 @@ def create_metadata(
     Args:
         folder_path: Path to a directory containing ``.wav`` files.
             Sub-directories are not searched.
-        output_dir: Directory where ``metadata.csv`` is written. Created
-            automatically if it does not exist. Pass ``None`` to skip
-            saving.
+        output_dir: Directory where ``metadata.parquet`` (or
+            ``metadata.csv``) is written. Created automatically if it does
+            not exist. Pass ``None`` to skip saving.
+        max_workers: Number of worker processes. Defaults to
+            ``os.cpu_count()``, or 1 when section analysis runs on a GPU.
+        output_format: ``"parquet"`` (zstd-compressed, needs ``pyarrow``)
+            or ``"csv"`` (floats written to 3 decimal places).
+        use_cache: Reuse results from earlier runs for files whose
+            modification time and size are unchanged, and store new
+            results. Pass ``False`` to force a full re-analysis, section
+            model included (fresh results are still stored).
 
     Returns:
         ``pd.DataFrame`` with columns:
@@ -132,11 +395,17 @@ def create_metadata(
     Raises:
         FileNotFoundError: If *folder_path* does not exist.
         NotADirectoryError: If *folder_path* is not a directory.
+        ValueError: If *output_format* is not ``"parquet"`` or ``"csv"``.
 
     Example:
         >>> df = create_metadata("/path/to/wav/folder")
         >>> print(df[["filename", "section", "section_bpm"]])
     """
+    if output_format not in ("parquet", "csv"):
+        raise ValueError(
+            f"output_format must be 'parquet' or 'csv', got {output_format!r}"
+        )
+
     folder = Path(folder_path).resolve()
     if not folder.exists():
         raise FileNotFoundError(f"Folder not found: {folder_path!r}")
@@ -148,143 +417,67 @@ def create_metadata(
         warnings.warn(f"No .wav files found in {folder_path!r}", UserWarning, stacklevel=2)
         return pd.DataFrame(columns=_COLUMNS)
 
-    rows: List[dict] = []
-
-    for wav_path in wav_files:
-        filepath_str = str(wav_path)
-        filename = wav_path.name
-
-        print(f"  Processing: {filename}")
-
-        # ------------------------------------------------------------------ #
-        # Global BPM                                                           #
-        # ------------------------------------------------------------------ #
-        try:
-            global_bpm = get_bpm(filepath_str)
-        except Exception as exc:
-            warnings.warn(f"[{filename}] get_bpm failed: {exc}", stacklevel=2)
-            global_bpm = float("nan")
-
-        # ------------------------------------------------------------------ #
-        # Musical key  —  expects get_key(filepath) -> (int, str)             #
-        # ------------------------------------------------------------------ #
-        try:
-            key_code, key_name = get_key(filepath_str)
-        except TypeError:
-            # Stub not yet updated to accept filepath; call without argument.
-            try:
-                key_code, key_name = get_key()
-            except Exception as exc:
-                warnings.warn(f"[{filename}] get_key failed: {exc}", stacklevel=2)
-                key_code, key_name = None, None
-        except Exception as exc:
-            warnings.warn(f"[{filename}] get_key failed: {exc}", stacklevel=2)
-            key_code, key_name = None, None
-
-        # ------------------------------------------------------------------ #
-        # Structural sections  —  expects get_sections(filepath)              #
-        #   -> sequence of (section_label: str, timestamp: float) tuples      #
-        # ------------------------------------------------------------------ #
-        try:
-            sections = get_sections(filepath_str)
-        except TypeError:
-            # Stub not yet updated to accept filepath.
+    # Workers read this when they import numba; sharing one directory lets
+    # them reuse each other's compiled librosa kernels.
+    os.environ.setdefault("NUMBA_CACHE_DIR", str(CACHE_DIR / "numba"))
+
+    paths = [str(p) for p in wav_files]
+    reuse_sections = use_cache
+
+    if analysis_device() != "cpu":
+        # allin1 loads its model on every call. On a GPU, run it once over
+        # every file still to be analysed; workers then find the section
+        # results in the cache instead of each reloading the model.
+        pending = [p for p in paths if not use_cache or load_cached(p, _CACHE_NAMESPACE) is None]
+        if pending:
             try:
-                sections = get_sections()
+                analyze_tracks(pending, use_cache=use_cache)
+                # Fresh either way now, so workers can read them back
+                reuse_sections = True
             except Exception as exc:
-                warnings.warn(f"[{filename}] get_sections failed: {exc}", stacklevel=2)
-                sections = ()
-        except Exception as exc:
-            warnings.warn(f"[{filename}] get_sections failed: {exc}", stacklevel=2)
-            sections = ()
-
-        # ------------------------------------------------------------------ #
-        # Load audio once for per-section BPM slicing                        #
-        # ------------------------------------------------------------------ #
-        y, sr, track_duration = None, None, float("nan")
-        try:
-            y, sr = librosa.load(filepath_str, mono=True, sr=None)
-            track_duration = len(y) / sr
-        except Exception as exc:
-            warnings.warn(
-                f"[{filename}] librosa.load failed; section BPMs will be NaN: {exc}",
-                stacklevel=2,
-            )
-
-        # ------------------------------------------------------------------ #
-        # Emit one row per section                                            #
-        # ------------------------------------------------------------------ #
-        if not sections:
-            rows.append(_make_row(
-                filename, filepath_str, key_code, key_name, global_bpm,
-                section=None,
-                section_start=float("nan"),
-                section_end=float("nan"),
-                section_bpm=float("nan"),
-            ))
-            continue
-
-        for i, (section_label, raw_start) in enumerate(sections):
-            try:
-                start_sec = float(raw_start)
-            except (TypeError, ValueError):
-                start_sec = float("nan")
-
-            # End = start of next section, or track duration for the last one.
-            if i + 1 < len(sections):
-                try:
-                    end_sec = float(sections[i + 1][1])
-                except (TypeError, ValueError):
-                    end_sec = float("nan")
-            else:
-                end_sec = track_duration
-
-            # Per-section BPM from the sliced waveform.
-            section_bpm = float("nan")
-            if y is not None and not (np.isnan(start_sec) or np.isnan(end_sec)):
-                start_sample = int(start_sec * sr)
-                end_sample = int(end_sec * sr)
-                y_slice = y[start_sample:end_sample]
-                prior = global_bpm if not np.isnan(global_bpm) else 120.0
-                section_bpm = _bpm_from_array(y_slice, sr, start_bpm=prior)
-
-            rows.append(_make_row(
-                filename, filepath_str, key_code, key_name, global_bpm,
-                section=section_label,
-                section_start=start_sec,
-                section_end=end_sec,
-                section_bpm=section_bpm,
-            ))
-
-    df = pd.DataFrame(rows, columns=_COLUMNS)
+                warnings.warn(f"Batched section analysis failed, falling back to per-file: {exc}",
+                              stacklevel=2)
+
+        if max_workers is None:
+            # Each worker would load its own copy of the section model onto
+            # the one GPU; a single worker keeps the GPU busy on its own.
+            max_workers = 1
+
+    # Built column-wise: one list per column avoids a dict per row and
+    # pandas re-inferring every row's keys and types.
+    columns: Dict[str, list] = {name: [] for name in _COLUMNS}
+
+    # Each file is analysed independently and the work is CPU-bound, so
+    # spread the files across processes. ``map`` preserves input order.
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=_pool_context(), initializer=_preload
+    ) as ex:
+        for track_columns in ex.map(_process_one, paths, repeat(use_cache), repeat(reuse_sections)):
+            for name in _COLUMNS:
+                columns[name].extend(track_columns[name])
+
+    df = pd.DataFrame(
+        {
+            name: np.asarray(values, dtype=np.float64) if name in _FLOAT_COLUMNS else values
+            for name, values in columns.items()
+        },
+        columns=_COLUMNS,
+    )
 
     if output_dir is not None:
         out_path = Path(output_dir)
         out_path.mkdir(parents=True, exist_ok=True)
-        csv_path = out_path / "metadata.csv"
-        df.to_csv(csv_path, index=False)
-        print(f"Saved metadata to: {csv_path}")
+        if output_format == "parquet":
+            file_path = out_path / "metadata.parquet"
+            df.to_parquet(file_path, engine="pyarrow", compression="zstd", index=False)
+        else:
+            file_path = out_path / "metadata.csv"
+            df.to_csv(file_path, index=False, chunksize=10000, float_format="%.3f")
+        print(f"Saved metadata to: {file_path}")
 
     return df
 
 
-def _make_row(
-    filename, filepath, key_code, key_name, global_bpm,
-    section, section_start, section_end, section_bpm,
-) -> dict:
-    return {
-        "filename": filename,
-        "filepath": filepath,
-        "key_code": key_code,
-        "key_name": key_name,
-        "global_bpm": global_bpm,
-        "section": section,
-        "section_start": section_start,
-        "section_end": section_end,
-        "section_bpm": section_bpm,
-    }
-
-
 # ---------------------------------------------------------------------------
 # CLI entry point
 # ---------------------------------------------------------------------------
@@ -0,0 +1,3 @@
+# get_key package: musical key detection and Camelot wheel helpers.
+
+from .detect_key import KEY_SR, get_key, get_key_from_array
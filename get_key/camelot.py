@@ -2,6 +2,9 @@
 # Converts detected key names into Camelot wheel codes.
 # Also computes compatibility distance between two songs.
 
+import numpy as np
+from .keyProfiles import PITCH_CLASSES
+
 # Full mapping of every key to its Camelot code
 # Format: "Note Quality" -> "NumberLetter"
 # A = minor, B = major
@@ -33,6 +36,21 @@ KEY_TO_CAMELOT = {
 }
 
 
+# Camelot number for each pitch class (index into PITCH_CLASSES), so a key
+# found by index never has to be turned into a "C major" string first
+CAMELOT_NUM_MAJOR = [int(KEY_TO_CAMELOT[p + " major"][:-1]) for p in PITCH_CLASSES]
+CAMELOT_NUM_MINOR = [int(KEY_TO_CAMELOT[p + " minor"][:-1]) for p in PITCH_CLASSES]
+
+# Every Camelot code pre-split into (number, letter) so comparisons never
+# re-parse strings. "8A" -> (8, "A")
+CAMELOT_PARSED = {code: (int(code[:-1]), code[-1]) for code in KEY_TO_CAMELOT.values()}
+
+# Codes in a fixed order and each code's small-int index into that order:
+# 0-11 = 1A..12A, 12-23 = 1B..12B
+CAMELOT_CODES = [f"{n}{letter}" for letter in "AB" for n in range(1, 13)]
+CAMELOT_INDEX = {code: i for i, code in enumerate(CAMELOT_CODES)}
+
+
 def get_camelot_code(key_name):
     """
     Takes a key name like "A minor" or "C major"
@@ -41,15 +59,39 @@ def get_camelot_code(key_name):
     return KEY_TO_CAMELOT.get(key_name, None)
 
 
+def camelot_code_from_index(pc_idx, is_minor):
+    """
+    Takes a pitch class index (0 = C ... 11 = B) and whether the key is minor
+    Returns: (number as int, letter as string)
+    Example: (9, True) -> (8, "A")   # A minor
+    """
+    if is_minor:
+        return CAMELOT_NUM_MINOR[pc_idx], "A"
+    return CAMELOT_NUM_MAJOR[pc_idx], "B"
+
+
 def parse_camelot(code):
     """
     Splits a Camelot code like "8A" into its number and letter.
     Returns: (number as int, letter as string)
     Example: "8A" -> (8, "A")
     """
-    number = int(code[:-1])
-    letter = code[-1]
-    return number, letter
+    parsed = CAMELOT_PARSED.get(code)
+    if parsed is None:
+        # Not a standard code (e.g. "08A"); parse it the slow way
+        parsed = int(code[:-1]), code[-1]
+    return parsed
+
+
+# Score by [circular distance on the wheel (capped at 3), same letter?]
+# based on DJ Camelot mixing rules
+SCORE_LUT = np.array([
+    # different letter, same letter
+    [0.9, 1.0],  # same number: relative major/minor / perfect same key
+    [0.6, 0.8],  # adjacent: letter switch acceptable / fifth, very stable
+    [0.3, 0.3],  # two steps away: risky but sometimes done
+    [0.0, 0.0],  # too far apart: not recommended
+])
 
 
 def camelot_compatibility(code_a, code_b):
@@ -65,6 +107,11 @@ def camelot_compatibility(code_a, code_b):
     Returns a compatibility score between 0.0 and 1.0
     where 1.0 = perfect and 0.0 = very incompatible
     """
+    idx_a = CAMELOT_INDEX.get(code_a)
+    idx_b = CAMELOT_INDEX.get(code_b)
+    if idx_a is not None and idx_b is not None:
+        return float(COMPAT[idx_a, idx_b])
+
     num_a, let_a = parse_camelot(code_a)
     num_b, let_b = parse_camelot(code_b)
 
@@ -72,29 +119,31 @@ def camelot_compatibility(code_a, code_b):
     raw_diff = abs(num_a - num_b)
     circular_diff = min(raw_diff, 12 - raw_diff)
 
-    same_letter = (let_a == let_b)
-
-    # Score based on DJ Camelot mixing rules
-    if circular_diff == 0 and same_letter:
-        # Perfect: same key
-        score = 1.0
-    elif circular_diff == 0 and not same_letter:
-        # Relative major/minor: same notes, different feel
-        score = 0.9
-    elif circular_diff == 1 and same_letter:
-        # Adjacent on wheel: fifth relationship, very stable
-        score = 0.8
-    elif circular_diff == 1 and not same_letter:
-        # Adjacent + letter switch: acceptable
-        score = 0.6
-    elif circular_diff == 2:
-        # Two steps away: risky but sometimes done
-        score = 0.3
-    else:
-        # Too far apart: not recommended
-        score = 0.0
+    return float(SCORE_LUT[min(circular_diff, 3), int(let_a == let_b)])
+
+
+def camelot_compatibility_matrix(numbers, letters):
+    """
+    Scores every pair of songs in one go, e.g. for a whole playlist.
+    numbers: Camelot numbers (1-12), one per song
+    letters: Camelot letters ("A" or "B"), one per song
+    Returns an N x N array where [i, j] = camelot_compatibility(song i, song j)
+    """
+    numbers = np.asarray(numbers)
+    letters = np.asarray(letters)
+
+    raw_diff = np.abs(numbers[:, None] - numbers[None, :])
+    circular_diff = np.minimum(raw_diff, 12 - raw_diff)
+    same_letter = letters[:, None] == letters[None, :]
+
+    return SCORE_LUT[np.minimum(circular_diff, 3), same_letter.astype(np.intp)]
+
 
-    return score
+# Score for every pair of codes, indexed by CAMELOT_INDEX (24 x 24)
+COMPAT = camelot_compatibility_matrix(
+    [CAMELOT_PARSED[code][0] for code in CAMELOT_CODES],
+    [CAMELOT_PARSED[code][1] for code in CAMELOT_CODES],
+)
 
 
 def get_transition_advice(code_a, code_b):
@@ -0,0 +1,88 @@
+import numpy as np
+import librosa
+import soundfile as sf
+from .keyProfiles import MAJOR_PROFILE, MINOR_PROFILE, PITCH_CLASSES, rotate_profile
+from .camelot import camelot_code_from_index
+
+# All 24 key profiles as rows: 0-11 are C major..B major, 12-23 are
+# C minor..B minor. Rotating right by i moves the tonic weight onto pitch i.
+# Rows are mean-centred and scaled to unit length once here, so scoring a
+# chroma vector only has to centre it and divide by its own norm.
+PROFILES = np.stack([rotate_profile(MAJOR_PROFILE, -i) for i in range(12)] +
+                    [rotate_profile(MINOR_PROFILE, -i) for i in range(12)])
+PROFILES = PROFILES - PROFILES.mean(axis=1, keepdims=True)
+PROFILES /= np.linalg.norm(PROFILES, axis=1, keepdims=True)
+
+KEY_NAMES = [p + ' major' for p in PITCH_CLASSES] + \
+            [p + ' minor' for p in PITCH_CLASSES]
+
+# Sample rate chroma is computed at (still resolves pitch up to ~5.5 kHz)
+KEY_SR = 11025
+
+def score_all_keys(chroma_vals):
+    # Pearson correlation of a 12-bin chroma vector with all 24 keys,
+    # in KEY_NAMES order
+    centred = chroma_vals - chroma_vals.mean()
+    return PROFILES @ centred / (np.linalg.norm(centred) + 1e-12)
+
+
+def detect_key(filepath):
+    # Load audio
+    print(f"Loading: {filepath}")
+    data, sr = sf.read(filepath, dtype="float32", always_2d=False)
+    y = data if data.ndim == 1 else data.mean(axis=1)  # downmix to mono
+    return detect_key_from_array(y, sr)
+
+
+def detect_key_from_array(y, sr):
+    # Same as detect_key, for audio that has already been loaded (mono)
+
+    # Key only needs a time-averaged pitch profile, so decimate first and
+    # use a long hop: far fewer STFT columns than chroma_cqt at native rate.
+    if sr != KEY_SR:
+        y = librosa.resample(y, orig_sr=sr, target_sr=KEY_SR, res_type='polyphase')
+    chroma = librosa.feature.chroma_stft(y=y, sr=KEY_SR, n_fft=4096, hop_length=2048)
+
+    # Sum across time (instead of mean)
+    chroma_vals = chroma.sum(axis=1)
+
+    # Correlate against all 24 keys at once
+    corrs = np.round(score_all_keys(chroma_vals), 3)
+
+    # Find best key
+    best = int(np.argmax(corrs))
+    best_key = KEY_NAMES[best]
+    best_corr = float(corrs[best])
+
+    # Find alternate key if close (the last one in key order wins)
+    close = np.flatnonzero((corrs > best_corr * 0.9) & (corrs != best_corr))
+    alt_key = KEY_NAMES[close[-1]] if close.size else None
+
+    # Convert to Camelot straight from the key's index (rows 12-23 are minor)
+    camelot_number, camelot_letter = camelot_code_from_index(best % 12, best >= 12)
+    camelot_code = f"{camelot_number}{camelot_letter}"
+
+    result = {
+        "key_name": best_key,
+        "camelot_code": camelot_code,
+        "camelot_number": camelot_number,
+        "camelot_letter": camelot_letter,
+        "confidence": best_corr,
+        "alternate_key": alt_key
+    }
+
+    print(f"Detected key: {best_key} ({camelot_code}) — confidence: {best_corr}")
+    if alt_key:
+        print(f"Also possible: {alt_key}")
+
+    return result
+
+
+def get_key(filepath: str):
+    result = detect_key(filepath)
+    return result["camelot_number"], result["key_name"]
+
+
+def get_key_from_array(y, sr):
+    result = detect_key_from_array(y, sr)
+    return result["camelot_number"], result["key_name"]
\ No newline at end of file
@@ -1,7 +1,10 @@
 # Krumhansl-Schmuckler key profiles.
 # 12 pitch classes (C, C#, D, D#, E, F, F#, G, G#, A, A#, B) appears in major vs minor keys.
+# Stored as float64 arrays so scoring never converts Python lists per call.
 
-MAJOR_PROFILE = [
+import numpy as np
+
+MAJOR_PROFILE = np.array([
     6.35,  # C
     2.23,  # C#
     3.48,  # D
@@ -14,9 +17,9 @@ MAJOR_PROFILE = [
     3.66,  # A
     2.29,  # A#
     2.88,  # B
-]
+], dtype=np.float64)
 
-MINOR_PROFILE = [
+MINOR_PROFILE = np.array([
     6.33,  # C
     2.68,  # C#
     3.52,  # D
@@ -29,8 +32,13 @@ MINOR_PROFILE = [
     2.69,  # A
     3.34,  # A#
     3.17,  # B
-]
+], dtype=np.float64)
 
 # The 12 pitch class names in order
 # Index 0 = C, Index 1 = C#, Index 2 = D, etc.
-PITCH_CLASSES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
\ No newline at end of file
+PITCH_CLASSES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+
+def rotate_profile(profile, steps):
+    # Rotate left by `steps` pitch classes, like profile[steps:] + profile[:steps]
+    return np.roll(profile, -steps)
\ No newline at end of file
@@ -1,9 +1,10 @@
 # test_key.py
 # Run this to verify all 3 key files work correctly
+# From the repo root: python -m get_key.test_key
 
-from keyProfiles import MAJOR_PROFILE, MINOR_PROFILE, PITCH_CLASSES
-from camelot import get_camelot_code, camelot_compatibility, get_transition_advice
-from get_key import get_key
+from get_key.keyProfiles import MAJOR_PROFILE, MINOR_PROFILE, PITCH_CLASSES
+from get_key.camelot import get_camelot_code, camelot_compatibility, camelot_compatibility_matrix, get_transition_advice
+from get_key.detect_key import get_key
 
 # --- Test 1: keyProfiles.py ---
 print("TEST 1: keyProfiles.py")
@@ -24,6 +25,8 @@ print(f"8A vs 8A (same key) should be 1.0: {camelot_compatibility('8A', '8A')}")
 print(f"8A vs 8B (relative) should be 0.9: {camelot_compatibility('8A', '8B')}")
 print(f"8A vs 9A (adjacent) should be 0.8: {camelot_compatibility('8A', '9A')}")
 print(f"8A vs 3B (far away) should be 0.0: {camelot_compatibility('8A', '3B')}")
+print(f"12A vs 1A (wraps around) should be 0.8: {camelot_compatibility('12A', '1A')}")
+print(f"8A row of [8A, 8B, 9A] matrix should be [1.0, 0.9, 0.8]: {camelot_compatibility_matrix([8, 8, 9], ['A', 'B', 'A'])[0]}")
 print()
 
 print("Transition advice:")
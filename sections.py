@@ -1,20 +1,53 @@
-import allin1
-import os
-import glob
-import librosa
-
-def find_beat_drop(result):
+import functools
+import numpy as np
+import soundfile as sf
+from audio_io import list_wavs
+from cache import cached_by_file, load_cached, store_cached
+from energy import HOP_LENGTH, frame_times
+
+@functools.lru_cache(maxsize=None)
+def analysis_device():
+    # allin1 is a PyTorch model; run it on the GPU when there is one
+    import torch
+    if torch.cuda.is_available():
+        return 'cuda'
+    if torch.backends.mps.is_available():
+        return 'mps'
+    return 'cpu'
+
+_ALLIN1_CACHE = 'allin1-v1'
+
+@cached_by_file(_ALLIN1_CACHE)
+def analyze_track(wav_path):
+    # allin1 takes seconds per track; results are cached on disk and in memory
+    import allin1  # pulls in torch; only pay for it when analysing
+    return allin1.analyze(wav_path, device=analysis_device())
+
+def analyze_tracks(wav_paths, use_cache=True):
+    # Like analyze_track for many files. allin1.analyze loads its model on
+    # every call, so all uncached files go through a single call.
+    results = {path: load_cached(path, _ALLIN1_CACHE) if use_cache else None
+               for path in wav_paths}
+    missing = [path for path, result in results.items() if result is None]
+    if missing:
+        import allin1
+        for path, result in zip(missing, allin1.analyze(missing, device=analysis_device())):
+            store_cached(path, _ALLIN1_CACHE, result)
+            results[path] = result
+    return [results[path] for path in wav_paths]
+
+def find_beat_drop(result, labels=None):
+    # First chorus that directly follows a verse, pre-chorus or intro
     segments = result.segments
-    for i, seg in enumerate(segments):
-        if seg.label == 'chorus':
-            if i > 0 and segments[i-1].label in ('verse', 'pre-chorus', 'intro'):
-                return seg.start
-    return None
-
-def find_buildup(wav_path, drop_time, window=16):
-    y, sr = librosa.load(wav_path)
-    rms = librosa.feature.rms(y=y)[0]
-    times = librosa.times_like(rms, sr=sr)
+    if labels is None:
+        labels = np.array([seg.label for seg in segments])
+    follows_lead_in = np.zeros(len(labels), dtype=bool)
+    follows_lead_in[1:] = np.isin(labels[:-1], ('verse', 'pre-chorus', 'intro'))
+    hits = np.flatnonzero((labels == 'chorus') & follows_lead_in)
+    return segments[hits[0]].start if hits.size else None
+
+def find_buildup(times, drop_time, window=16):
+    # times: the RMS frame times from extract_key_moments
     mask = (times >= drop_time - window) & (times < drop_time)
     if mask.any():
         return times[mask][0]
@@ -25,16 +58,17 @@ def format_time(seconds):
     s = seconds % 60
     return f"{m}:{s:04.1f}"
 
-def extract_key_moments(wav_path, result):
+def extract_key_moments(n_samples, sr, result):
     segments = result.segments
-    drop_time = find_beat_drop(result)
-    buildup_time = find_buildup(wav_path, drop_time) if drop_time else None
+    labels = np.array([seg.label for seg in segments])
+    drop_time = find_beat_drop(result, labels)
+    # Only the RMS frame grid matters here, so the track length is enough
+    times = frame_times(1 + n_samples // HOP_LENGTH, sr)
+    buildup_time = find_buildup(times, drop_time) if drop_time else None
 
     def first_of(label):
-        for seg in segments:
-            if seg.label == label:
-                return seg.start
-        return None
+        hits = np.flatnonzero(labels == label)
+        return segments[hits[0]].start if hits.size else None
 
     intro    = first_of('intro')
     verse    = first_of('verse')
@@ -52,22 +86,22 @@ def extract_key_moments(wav_path, result):
     )
 
 def analyze_songs(folder_path):
-    wav_files = glob.glob(f'{folder_path}/*.wav')
-    all_results = {}
+    wav_files = list_wavs(folder_path)
 
-    for wav_path in wav_files:
-        if not os.path.exists(wav_path):
-            print(f"File not found, skipping: {wav_path}")
-            continue
+    # Run the model once over the whole folder. The key moments only need
+    # each track's length, which the header gives without decoding audio.
+    results = analyze_tracks(wav_files)
 
-        print(f"\nAnalyzing: {wav_path}")
-        result = allin1.analyze(wav_path)
+    all_results = {}
+    for wav_path, result in zip(wav_files, results):
+        info = sf.info(wav_path)
+        moments = extract_key_moments(info.frames, info.samplerate, result)
 
+        print(f"\nAnalyzing: {wav_path}")
         print("Segments:")
         for seg in result.segments:
             print(f"  {seg.label:10} {seg.start:.1f}s → {seg.end:.1f}s")
 
-        moments = extract_key_moments(wav_path, result)
         print("\nKey Moments:")
         for label, timestamp in moments:
             print(f"  {label:10} {timestamp}")
@@ -82,18 +116,31 @@ def analyze_songs(folder_path):
 ##    print(moments)
 
 
-def get_sections(filepath: str):
+def get_sections(filepath: str, y=None, sr=None, use_cache=True):
     """Return key structural moments for a WAV file as float timestamps.
 
-    Runs allin1 analysis on *filepath* and extracts the start time (in
-    seconds) for Intro, Verse, Buildup, Beatdrop, Chorus, and Outro.
+    Runs allin1 analysis on *filepath* (on the GPU if one is available,
+    see ``analysis_device``; cached per file, see ``analyze_track``) and
+    extracts the start time (in seconds) for Intro, Verse, Buildup,
+    Beatdrop, Chorus, and Outro.
 
     Args:
         filepath: Path to a ``.wav`` audio file.
+        y: Optional mono audio already decoded from *filepath*. Only its
+            length is used; when omitted the length is read from the file
+            header instead of decoding.
+        sr: Sample rate of *y* in Hz.
+        use_cache: Reuse a cached allin1 result for *filepath*. ``False``
+            re-runs the model (and refreshes the cache).
 
     Returns:
         Tuple of ``(section_label, start_seconds)`` pairs. ``start_seconds``
         is a float, or ``None`` if that section was not detected.
     """
-    result = allin1.analyze(filepath)
-    return extract_key_moments(filepath, result)
\ No newline at end of file
+    if y is None:
+        info = sf.info(filepath)
+        n_samples, sr = info.frames, info.samplerate
+    else:
+        n_samples = len(y)
+    result = analyze_track(filepath, use_cache=use_cache)
+    return extract_key_moments(n_samples, sr, result)
\ No newline at end of file
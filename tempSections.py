@@ -1,58 +1,116 @@
-import os
-import glob
 import librosa
 import numpy as np
-import msaf
 from collections import Counter
-
-def find_buildup(wav_path, drop_time, window=16):
-    y, sr = librosa.load(wav_path)
-    rms   = librosa.feature.rms(y=y)[0]
-    times = librosa.times_like(rms, sr=sr)
+from concurrent.futures import ProcessPoolExecutor
+from scipy.signal import find_peaks
+from sklearn.cluster import KMeans
+from threadpoolctl import threadpool_limits
+from audio_io import list_wavs
+from cache import cached_by_file
+from energy import (ENERGY_FRAME_LENGTH, ENERGY_HOP_LENGTH, ENERGY_SR, fast_rms,
+                    frame_times, load_for_energy)
+
+# Segmentation features: MFCCs of the 8 kHz energy signal, one frame every
+# 128 ms. Only a handful of boundaries are wanted, so a coarse grid is plenty.
+SEG_HOP_LENGTH = 1024
+KERNEL_SIZE    = 64   # Foote kernel width in frames (~8 s)
+NUM_LABELS     = 4    # segment clusters, like fmc2d's
+MAX_BOUNDARIES = 12   # strongest novelty peaks kept
+
+def checkerboard_kernel(size):
+    # Gaussian-tapered checkerboard: +1 within each half, -1 across them
+    half = size // 2
+    offsets = np.arange(-half, half) + 0.5
+    side = np.sign(offsets) * np.exp(-0.5 * (offsets / (0.5 * half)) ** 2)
+    return np.outer(side, side)
+
+def foote_novelty(feats, kernel):
+    # Correlate the kernel along the diagonal of the cosine self-similarity
+    # matrix of feats. Only the kernel-wide band of the matrix is ever read,
+    # so build it one diagonal at a time from unit-length frames instead of
+    # materialising all N x N similarities. Zero rows beyond either end
+    # stand in for the matrix's zero padding.
+    size = len(kernel)
+    half = size // 2
+    norms = np.linalg.norm(feats, axis=1, keepdims=True)
+    unit = np.divide(feats, norms, out=np.zeros_like(feats), where=norms > 0)
+    padded = np.pad(unit, ((half, half), (0, 0)))
+
+    novelty = np.zeros(len(feats))
+    for k in range(size):
+        # similarity of every frame with the one k frames later
+        band = np.einsum('ij,ij->i', padded[:len(padded) - k], padded[k:])
+        weights = np.diagonal(kernel, k)
+        if k:
+            weights = weights + np.diagonal(kernel, -k)
+        novelty += np.correlate(band, weights, 'valid')[:len(feats)]
+    return novelty
+
+@cached_by_file('foote-mfcc-kmeans-v3')
+def segment_track(wav_path):
+    # Foote boundaries on an MFCC self-similarity matrix, segments labelled
+    # by k-means on their mean MFCCs. The RMS envelope for the drop search
+    # comes from the same decode. Cached on disk and in memory, and shared
+    # between calls, so the returned arrays are read-only.
+    y, sr = load_for_energy(wav_path)
+    rms = fast_rms(y, ENERGY_FRAME_LENGTH, ENERGY_HOP_LENGTH)
+    duration = len(y) / sr
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13, n_mels=40, hop_length=SEG_HOP_LENGTH)
+    feats = mfcc.T
+
+    novelty = foote_novelty(feats, checkerboard_kernel(KERNEL_SIZE))
+    peaks, props = find_peaks(novelty, height=0, distance=KERNEL_SIZE // 2)
+    peaks = np.sort(peaks[np.argsort(props['peak_heights'])[::-1][:MAX_BOUNDARIES]])
+
+    bounds = np.concatenate(([0], peaks, [len(feats)]))
+    segment_feats = np.array([feats[a:b].mean(axis=0) for a, b in zip(bounds[:-1], bounds[1:])])
+    n_labels = min(NUM_LABELS, len(segment_feats))
+    labels = KMeans(n_clusters=n_labels, n_init=10, random_state=0).fit_predict(segment_feats)
+
+    # Segment start times plus the track end, as msaf returned them
+    boundaries = np.concatenate(([0.0], peaks * SEG_HOP_LENGTH / sr, [duration]))
+    boundaries.flags.writeable = False
+    labels.flags.writeable = False
+    rms.flags.writeable = False
+    return boundaries, labels, rms
+
+def find_buildup(times, drop_time, window=16):
+    # times: the RMS frame times from extract_key_moments
     mask  = (times >= drop_time - window) & (times < drop_time)
     if mask.any():
         return float(times[mask][0])
     return float(max(0, drop_time - window))
 
-def extract_key_moments(wav_path, boundaries, labels):
-    boundaries = list(boundaries)
-    labels     = list(labels)
+def extract_key_moments(boundaries, labels, rms):
+    boundaries = np.asarray(boundaries, dtype=np.float64)
+    labels     = np.asarray(labels)
 
-    counts       = Counter(labels)
+    counts       = Counter(labels.tolist())
     chorus_label = counts.most_common(1)[0][0]
     intro_label  = labels[0]
     outro_label  = labels[-1]
 
     def first_of(target_label):
-        for i, label in enumerate(labels):
-            if label == target_label:
-                return float(boundaries[i])
-        return None
+        hits = np.flatnonzero(labels == target_label)
+        return float(boundaries[hits[0]]) if hits.size else None
 
     def last_of(target_label):
-        for i, label in reversed(list(enumerate(labels))):
-            if label == target_label:
-                return float(boundaries[i])
-        return None
+        hits = np.flatnonzero(labels == target_label)
+        return float(boundaries[hits[-1]]) if hits.size else None
 
     intro  = first_of(intro_label)
     chorus = first_of(chorus_label)
     outro  = last_of(outro_label) if outro_label != intro_label else float(boundaries[-1])  # fix outro
 
     # verse = first segment that is not intro or chorus
-    verse = None
-    for i, label in enumerate(labels):
-        if label not in (intro_label, chorus_label):
-            verse = float(boundaries[i])
-            break
-
-    # beatdrop and buildup from energy
-    y, sr = librosa.load(wav_path)
-    rms   = librosa.feature.rms(y=y)[0]
-    times = librosa.times_like(rms, sr=sr)
+    others = np.flatnonzero(~np.isin(labels, (intro_label, chorus_label)))
+    verse  = float(boundaries[others[0]]) if others.size else None
+
+    # beatdrop and buildup from the energy envelope
+    times = frame_times(len(rms), ENERGY_SR, ENERGY_HOP_LENGTH)
     diff  = np.diff(rms)
     drop_time    = float(times[np.argmax(diff)])
-    buildup_time = find_buildup(wav_path, drop_time, window=8)  # tightened to 8s
+    buildup_time = find_buildup(times, drop_time, window=8)  # tightened to 8s
 
     return (
         ("Intro",    intro),
@@ -64,40 +122,34 @@ def extract_key_moments(wav_path, boundaries, labels):
     )
 
 def get_sections(filepath: str):
-    boundaries, labels = msaf.process(
-        filepath,
-        boundaries_id='foote',
-        labels_id='fmc2d',
-    )
-    return extract_key_moments(filepath, boundaries, labels)
-
-def analyze_songs(folder_path):
-    wav_files = glob.glob(f'{folder_path}/*.wav')
-    all_results = {}
-
-    for wav_path in wav_files:
-        if not os.path.exists(wav_path):
-            print(f"File not found, skipping: {wav_path}")
-            continue
+    return extract_key_moments(*segment_track(filepath))
 
-        print(f"\nAnalyzing: {wav_path}")
-        boundaries, labels = msaf.process(
-            wav_path,
-            boundaries_id='foote',
-            labels_id='fmc2d',
-        )
+def _limit_threads():
+    # Pool initializer: one process per track already uses every core, so
+    # keep each worker's BLAS/OpenMP pools from oversubscribing them.
+    threadpool_limits(1)
 
-        print("Segments:")
-        for label, start in zip(labels, boundaries):
-            print(f"  {label:10} {start:.1f}s")
+def _analyze_one(wav_path):
+    boundaries, labels, rms = segment_track(wav_path)
+    return boundaries, labels, extract_key_moments(boundaries, labels, rms)
 
-        moments = extract_key_moments(wav_path, boundaries, labels)
+def analyze_songs(folder_path, max_workers=None):
+    wav_files = list_wavs(folder_path)
 
-        print("\nKey Moments:")
-        for label, timestamp in moments:
-            print(f"  {label:10} {timestamp}")
-
-        all_results[wav_path] = moments
+    all_results = {}
+    # map() yields in input order, so output stays grouped per song.
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_limit_threads) as ex:
+        for wav_path, (boundaries, labels, moments) in zip(wav_files, ex.map(_analyze_one, wav_files)):
+            print(f"\nAnalyzing: {wav_path}")
+            print("Segments:")
+            for label, start in zip(labels, boundaries):
+                print(f"  {label:10} {start:.1f}s")
+
+            print("\nKey Moments:")
+            for label, timestamp in moments:
+                print(f"  {label:10} {timestamp}")
+
+            all_results[wav_path] = moments
 
     return all_results
 
@@ -4,6 +4,7 @@
 #    - songA_wav_path, songB_wav_path
 #    - sr (sample rate)
 #    - bpm.py provides: get_bpm(wav_path) -> float
+#                       beat_grid(wav_path) -> (beats_sec, downbeats_sec)  (cached per file)
 #    - key.py provides: get_camelot_key(wav_path) -> str  (e.g., "8A", "9B")
 #    - sections.py provides: get_sections(wav_path) -> List[Segment]
 #         where Segment has:
@@ -87,13 +88,12 @@
 #    2.3 Snap candidate times to the nearest beat so transitions land musically.
 #
 #    2.4 Beat phase alignment (critical — BPM match alone is not enough):
-#        # Get the actual beat grid for each track (not a synthetic BPM grid):
-#        beatsA = librosa.beat.beat_track(y=audioA, sr=sr, units='time')[1]
-#        beatsB = librosa.beat.beat_track(y=audioB, sr=sr, units='time')[1]
+#        # Get the actual beat grid for each track (not a synthetic BPM grid).
+#        # bpm.beat_grid caches per file, so each track is only tracked once:
+#        beatsA, downbeatsA = beat_grid(songA_wav_path)
+#        beatsB, downbeatsB = beat_grid(songB_wav_path)
 #
-#        # Derive downbeat positions (assume 4/4: every 4th beat):
-#        downbeatsA = beatsA[::4]
-#        downbeatsB = beatsB[::4]
+#        # (downbeats assume 4/4: every 4th beat, phase picked by onset strength)
 #
 #        # After tA_best and tB_best are chosen (step 3), snap to nearest downbeat:
 #        tA_aligned = downbeatsA[argmin(abs(downbeatsA - tA_best))]
@@ -1,46 +1,52 @@
 import numpy as np
-import librosa
-#import soundfile as sf
-from scipy.io.wavfile import write
+import soundfile as sf
+from itertools import chain
+from fades import equal_power_curves
+from streaming import read_blocks, read_frames
 
 def crossfadesin(wav1_path, wav2_path, output_path, fade_out_start, fade_in_end, max_fade_seconds=8):
     
-    y1, sr1 = librosa.load(wav1_path, sr=None, mono=False)
-    y2, sr2 = librosa.load(wav2_path, sr=None, mono=False)
-
-    if sr1 != sr2:
-        y2 = librosa.resample(y2, orig_sr=sr2, target_sr=sr1)
-    sr = sr1
+    # Only the overlap needs arithmetic, so only it is held in memory; the
+    # rest of both songs streams from disk to disk in blocks. Audio stays in
+    # soundfile's (samples, channels) layout throughout.
+    info1 = sf.info(wav1_path)
+    sr = info1.samplerate  # song 2 is resampled to this if it differs
 
     # Cut song 1 to only go max_fade_seconds past the fade out start
-    cut_sample = int((fade_out_start + max_fade_seconds) * sr)
-    y1 = y1[..., :cut_sample]
+    end1 = min(info1.frames, int((fade_out_start + max_fade_seconds) * sr))
 
     # Cut song 2 to start max_fade_seconds before the fade in end
-    start_sample = max(0, int((fade_in_end - max_fade_seconds) * sr))
-    y2 = y2[..., start_sample:]
+    start2 = max(0, int((fade_in_end - max_fade_seconds) * sr))
 
     fade_samples = int(max_fade_seconds * sr)
+    fade_start = end1 - fade_samples
     
-    t = np.linspace(0, 1, fade_samples)
-    fade_out_curve = np.cos(t * np.pi / 2)
-    fade_in_curve  = np.sin(t * np.pi / 2)
-
-    y1[..., -fade_samples:] *= fade_out_curve
-    y2[..., :fade_samples]  *= fade_in_curve
-
-    overlap = y1[..., -fade_samples:] + y2[..., :fade_samples]
-
-    output = np.concatenate([
-        y1[..., :-fade_samples],
-        overlap,
-        y2[..., fade_samples:]
-    ], axis=-1)
-
-    output = output / np.max(np.abs(output))
-    
-    from scipy.io.wavfile import write
-    write(output_path, sr, output.T.astype(np.float32))
+    fade_out_curve, fade_in_curve = equal_power_curves(fade_samples)
+
+    # Mix the overlap in place: song 1's tail faded out plus song 2's head faded in
+    overlap = read_frames(wav1_path, sr, fade_start, fade_samples)
+    head2 = read_frames(wav2_path, sr, start2, fade_samples)
+    overlap *= fade_out_curve[:, None]
+    head2   *= fade_in_curve[:, None]
+    overlap += head2
+
+    def song1_before():
+        return read_blocks(wav1_path, sr, stop=fade_start)
+
+    def song2_after():
+        return read_blocks(wav2_path, sr, start=start2 + fade_samples)
+
+    # Peak-normalising needs the whole mix's peak before anything is
+    # written: a first pass only takes min/max, the second writes
+    peak = max(-overlap.min(), overlap.max())
+    for block in chain(song1_before(), song2_after()):
+        peak = max(peak, -block.min(), block.max())
+
+    with sf.SoundFile(output_path, 'w', sr, overlap.shape[1], subtype='FLOAT') as out:
+        for block in chain(song1_before(), [overlap], song2_after()):
+            if peak > 0:
+                np.divide(block, peak, out=block)
+            out.write(block)
     print(f"Saved crossfade to: {output_path}")
     
 # example: 
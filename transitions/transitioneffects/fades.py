@@ -0,0 +1,16 @@
+import functools
+import numpy as np
+
+@functools.lru_cache(maxsize=32)
+def equal_power_curves(n):
+    """
+    Returns (fade_out, fade_in) equal-power curves of n samples: cos and sin
+    over a quarter turn, so fade_out**2 + fade_in**2 == 1 throughout.
+    Cached and shared between calls, so the arrays are read-only.
+    """
+    t = np.linspace(0, np.pi / 2, n)
+    fade_out = np.cos(t).astype(np.float32)
+    fade_in = np.sin(t).astype(np.float32)
+    fade_out.flags.writeable = False
+    fade_in.flags.writeable = False
+    return fade_out, fade_in
@@ -1,105 +1,177 @@
+import functools
 import numpy as np
-import librosa
+from numba import njit, prange
 import soundfile as sf
-from scipy.signal import butter, sosfilt
+from scipy.signal import butter, oaconvolve, sosfilt, sosfilt_zi
+from fades import equal_power_curves
+from streaming import read_blocks, read_frames
 
-def low_cut_filter(y, sr, cutoff_hz):
+@functools.lru_cache(maxsize=64)
+def low_cut_sos(cutoff_hz, sr):
+    """
+    4th-order Butterworth high-pass design, cached since the transition
+    only ever asks for a handful of (cutoff, sr) pairs.
+    """
+    return butter(4, cutoff_hz, btype='high', fs=sr, output='sos')
+
+
+def low_cut_filter(y, sr, cutoff_hz, zi=None):
     """
     Removes frequencies below cutoff_hz (cuts the bass).
     cutoff_hz = 200 means everything below 200Hz gets removed.
+    Pass zi (filter state) to continue from a previous chunk; then the
+    final state is returned too, as (filtered, zf).
     """
-    sos = butter(4, cutoff_hz, btype='high', fs=sr, output='sos')
-    return sosfilt(sos, y)
+    sos = low_cut_sos(cutoff_hz, sr)
+    if zi is None:
+        return sosfilt(sos, y)
+    return sosfilt(sos, y, zi=zi)
 
 
-def add_echo(y, sr, delay_seconds=0.2, decay=0.6):
+def add_echo(y, sr, delay_seconds=0.2, decay=0.6, taps=1):
     """
     Adds an echo effect by mixing the signal with a delayed version of itself.
     delay_seconds = how long before the echo hits
     decay = how loud the echo is (0.4 = 40% of original volume)
+    taps = number of repeats, each decay times quieter than the last
     *Was 0.3 for delayed_seconds and 0.4 for decay*
     """
     delay_samples = int(sr * delay_seconds)
-    echo = np.zeros_like(y)
-    echo[delay_samples:] = y[:-delay_samples] * decay
-    return y + echo
+    if delay_samples < 1 or delay_samples >= len(y):
+        return y.copy()  # no room for an echo
 
+    if taps == 1:
+        out = y.copy()
+        out[delay_samples:] += y[:-delay_samples] * decay
+        return out
 
-def low_cut_echo_transition(song_a, song_b, sr, transition_seconds=8.0):
+    # Multi-tap: convolve with a sparse impulse response (1, decay,
+    # decay**2, ... every delay_samples) in one FFT pass instead of
+    # one shifted add per tap
+    ir = np.zeros(taps * delay_samples + 1, dtype=y.dtype)
+    ir[::delay_samples] = decay ** np.arange(taps + 1)
+    return oaconvolve(y, ir)[:len(y)]
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _echo_fade_mix(a, b, delay_samples, decay, fade_out, fade_in, out):
     """
-    Transitions from song_a to song_b using:
-    1. Gradually cutting bass from song_a
-    2. Adding echo to song_a's tail
-    3. Bringing in song_b clean
+    out = add_echo(a) * fade_out + b * fade_in, fused into one pass with no
+    temporaries. Each output sample only reads the inputs, so the loop
+    runs in parallel.
     """
-    transition_samples = int(sr * transition_seconds)
+    for i in prange(len(out)):
+        x = a[i]
+        if 0 < delay_samples <= i:
+            x += a[i - delay_samples] * decay
+        out[i] = x * fade_out[i] + b[i] * fade_in[i]
+
 
-    # Get the transition section of song_a (last N seconds)
-    end_a = song_a[-transition_samples:].copy()
+def low_cut_echo_section(end_a, start_b, sr, out=None):
+    """
+    The transition itself: end_a (song_a's last N samples) with a rising
+    low cut and echo, faded out under start_b (song_b's first N samples).
+    Written into out if given. The low cut is a recursive filter and stays
+    in scipy; the echo, fades and blend run as one compiled kernel.
+    """
+    transition_samples = len(end_a)
+    if out is None:
+        out = np.empty(transition_samples, dtype=np.float32)
 
-    # Get the start of song_b (first N seconds)
-    start_b = song_b[:transition_samples].copy()
+    # The compiled kernel doesn't bounds-check, so lengths must match here
+    if len(start_b) != transition_samples or len(out) != transition_samples:
+        raise ValueError(
+            f"end_a, start_b and out must all be {transition_samples} samples long, "
+            f"got start_b={len(start_b)}, out={len(out)}"
+        )
 
     # Gradually increase the low cut on song_a
     # At start of transition: no cut
     # At end of transition: full bass cut at 200Hz
-    result_a = np.zeros_like(end_a)
+    result_a = end_a.copy()
     num_steps = 8  # number of steps to gradually apply filter
 
-    step_size = transition_samples // num_steps
+    # Step edges; the last step runs to the end even if the length
+    # doesn't divide evenly
+    edges = np.linspace(0, transition_samples, num_steps + 1).astype(int)
+
+    # One filter state carries through every step, so raising the cutoff
+    # doesn't restart the filter (and click) at each step edge
+    zi = None
 
     for i in range(num_steps):
-        start = i * step_size
-        end = start + step_size
+        start, end = edges[i], edges[i + 1]
 
         # Cutoff increases from 0 to 200Hz gradually
         cutoff = int((i / num_steps) * 200)
 
-        chunk = end_a[start:end].copy()
-
-        if cutoff > 20:  # only filter if cutoff is meaningful
-            chunk = low_cut_filter(chunk, sr, cutoff)
+        if cutoff > 20 and end > start:  # only filter if cutoff is meaningful
+            chunk = end_a[start:end]
+            if zi is None:
+                # settle the filter on the first sample instead of zero
+                zi = sosfilt_zi(low_cut_sos(cutoff, sr)) * chunk[0]
+            result_a[start:end], zi = low_cut_filter(chunk, sr, cutoff, zi=zi)
 
-        result_a[start:end] = chunk
+    # Fade out song_a, fade in song_b using equal power
+    fade_out, fade_in = equal_power_curves(transition_samples)
 
-    # Add echo to the filtered song_a tail
-    result_a = add_echo(result_a, sr, delay_seconds=0.3, decay=0.4) #the numbers are good
+    # Echo the filtered song_a tail, fade and blend with song_b, written
+    # straight into out in one pass
+    delay_samples = int(sr * 0.3)  # 0.3s delay, 0.4 decay: the numbers are good
+    _echo_fade_mix(result_a, start_b, delay_samples, 0.4, fade_out, fade_in, out)
+    return out
 
-    # Fade out song_a, fade in song_b using equal power
-    t = np.linspace(0, np.pi/2, transition_samples)
-    fade_out = np.cos(t)
-    fade_in = np.sin(t)
 
-    # Blend together
-    blended = (result_a * fade_out) + (start_b * fade_in)
+def low_cut_echo_transition(song_a, song_b, sr, transition_seconds=8.0):
+    """
+    Transitions from song_a to song_b using:
+    1. Gradually cutting bass from song_a
+    2. Adding echo to song_a's tail
+    3. Bringing in song_b clean
+    """
+    transition_samples = int(sr * transition_seconds)
 
-    # Build final output
-    final = np.concatenate([
-        song_a[:-transition_samples],   # song_a without transition section
-        blended,                         # the low cut echo transition
-        song_b[transition_samples:]      # song_b after its intro
-    ])
+    # Build final output in one preallocated buffer
+    keep_a = len(song_a) - transition_samples
+    final = np.empty(keep_a + len(song_b), dtype=np.float32)
+    final[:keep_a] = song_a[:keep_a]                       # song_a without transition section
+    final[keep_a + transition_samples:] = song_b[transition_samples:]  # song_b after its intro
 
+    # The transition section: last N seconds of song_a into first N of song_b
+    low_cut_echo_section(song_a[keep_a:], song_b[:transition_samples], sr,
+                         out=final[keep_a:keep_a + transition_samples])
     return final
 
 
 def mix_with_low_cut_echo(filepath_a, filepath_b, output_path, transition_seconds=8.0):
     """
-    Loads two songs and creates a mix with low cut echo transition.
+    Creates a mix of two songs with low cut echo transition.
+    Only the transition section is held in memory; the rest of both songs
+    streams from disk to disk in blocks (downmixed to mono).
     """
-    print(f"Loading Song A: {filepath_a}")
-    song_a, sr = librosa.load(filepath_a, mono=True, sr=None)
-
-    print(f"Loading Song B: {filepath_b}")
-    song_b, sr2 = librosa.load(filepath_b, mono=True, sr=None)
+    info_a = sf.info(filepath_a)
+    sr = info_a.samplerate
 
     # Make sure both songs have same sample rate
-    if sr != sr2:
+    if sf.info(filepath_b).samplerate != sr:
         print("Warning: sample rates differ, resampling song_b")
-        song_b = librosa.resample(song_b, orig_sr=sr2, target_sr=sr)
 
-    print("Applying low cut echo transition...")
-    final = low_cut_echo_transition(song_a, song_b, sr, transition_seconds)
+    transition_samples = int(sr * transition_seconds)
+    keep_a = info_a.frames - transition_samples
+
+    print(f"Loading transition from Song A: {filepath_a}")
+    end_a = read_frames(filepath_a, sr, keep_a, transition_samples, mono=True)
 
-    sf.write(output_path, final, sr)
+    print(f"Loading transition from Song B: {filepath_b}")
+    start_b = read_frames(filepath_b, sr, 0, transition_samples, mono=True)
+
+    print("Applying low cut echo transition...")
+    section = low_cut_echo_section(end_a, start_b, sr)
+
+    with sf.SoundFile(output_path, 'w', sr, 1) as out:
+        for block in read_blocks(filepath_a, sr, stop=keep_a, mono=True):
+            out.write(block)
+        out.write(section)
+        for block in read_blocks(filepath_b, sr, start=transition_samples, mono=True):
+            out.write(block)
     print(f"Mix saved to: {output_path}")
\ No newline at end of file
@@ -0,0 +1,71 @@
+import numpy as np
+import soundfile as sf
+import soxr
+from math import ceil, gcd
+
+BLOCKSIZE = 65536         # frames per block when streaming audio disk to disk
+RESAMPLE_CONTEXT = 4096   # extra samples resampled either side of a range
+
+def read_blocks(path, sr, start=0, stop=None, mono=False, blocksize=BLOCKSIZE):
+    """
+    Yields float32 blocks of the file at path, resampled to sr with soxr if
+    its rate differs. start/stop are sample positions at sr.
+    Blocks are (frames, channels), or 1-D if mono (downmixed).
+    """
+    info = sf.info(path)
+    if info.samplerate == sr:
+        for block in sf.blocks(path, blocksize=blocksize, start=start, stop=stop,
+                               dtype='float32', always_2d=True):
+            yield block.mean(axis=1) if mono else block
+        return
+
+    # Resampling a stream that starts or stops mid-file rings at its edges.
+    # Start and stop RESAMPLE_CONTEXT samples wide and trim, starting on a
+    # sample where the two rates' grids line up, so the blocks match what
+    # resampling the whole file and slicing it would give.
+    g = gcd(info.samplerate, sr)
+    src_step, out_step = info.samplerate // g, sr // g
+    origin = max(0, start - RESAMPLE_CONTEXT) // out_step
+    skip = start - origin * out_step
+    remaining = None if stop is None else stop - start
+    src_stop = None if stop is None else ceil((stop + RESAMPLE_CONTEXT) * info.samplerate / sr)
+    if remaining is not None and remaining <= 0:
+        return
+
+    resampler = soxr.ResampleStream(info.samplerate, sr, 1 if mono else info.channels,
+                                    dtype='float32', quality='HQ')
+
+    def resampled():
+        for block in sf.blocks(path, blocksize=blocksize, start=origin * src_step,
+                               stop=src_stop, dtype='float32', always_2d=True):
+            yield resampler.resample_chunk(block.mean(axis=1) if mono else block)
+        empty = np.zeros((0,) if mono else (0, info.channels), dtype=np.float32)
+        yield resampler.resample_chunk(empty, last=True)
+
+    for block in resampled():
+        if skip:
+            dropped = min(skip, len(block))
+            block, skip = block[dropped:], skip - dropped
+        if remaining is not None:
+            block = block[:remaining]
+            remaining -= len(block)
+        if len(block):
+            yield block
+        if remaining == 0:
+            return
+
+
+def read_frames(path, sr, start, n, mono=False):
+    """
+    Reads exactly n frames at sr starting at start, zero-padded if the file
+    runs out first (resampling can also land a frame short).
+    """
+    info = sf.info(path)
+    shape = (n,) if mono else (n, info.channels)
+    out = np.zeros(shape, dtype=np.float32)
+    filled = 0
+    for block in read_blocks(path, sr, start, start + n, mono=mono):
+        take = min(len(block), n - filled)
+        out[filled:filled + take] = block[:take]
+        filled += take
+    return out